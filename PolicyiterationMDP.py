@@ -9,6 +9,33 @@ Created on Sat Jun  8 05:26:45 2019
 import random
 import operator
 import time
+import functools
+import warnings
+import multiprocessing
+from collections import deque
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve, MatrixRankWarning
+
+try:
+    from numba import njit, prange
+except ImportError:
+    # numba is optional, without it the kernels below run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+    prange = range
+
+try:
+    import cupy as cp
+    import cupyx.scipy.sparse as cpsp
+    from cupyx.scipy.sparse.linalg import spsolve as gpu_spsolve
+    GPU_AVAILABLE = cp.cuda.runtime.getDeviceCount() > 0
+except (ImportError, RuntimeError):
+    # cupy is optional, and only of use with a CUDA device
+    GPU_AVAILABLE = False
 
 orientations = EAST, NORTH, WEST, SOUTH = [(1, 0), (0, 1), (-1, 0), (0, -1)]
 turns = LEFT, RIGHT = (+1, -1)
@@ -21,12 +48,18 @@ def vector_add(a, b):
 def turn_heading(heading, inc, headings=orientations):
     return headings[(headings.index(heading) + inc) % len(headings)]
 
+# the result of every turn from every orientation, so that turn_right and
+# turn_left do not have to search the orientations list
+_ORIENT_IDX = {o: i for i, o in enumerate(orientations)}
+_TURN_TABLE = {(o, t): orientations[(i + t) % len(orientations)]
+               for o, i in _ORIENT_IDX.items() for t in turns}
+
 def turn_right(heading):
-    return turn_heading(heading, RIGHT)
+    return _TURN_TABLE[(heading, RIGHT)]
 
 
 def turn_left(heading):
-    return turn_heading(heading, LEFT)
+    return _TURN_TABLE[(heading, LEFT)]
 
 class MDP:
 
@@ -55,15 +88,20 @@ class MDP:
             # if actlist is a dict, different actions for each state
             self.actlist = actlist
         
-        self.terminals = terminals
+        self.terminals = frozenset(terminals)
         self.transitions = transitions or {}
-        if not self.transitions:
+        # subclasses that override T can compute it without a table
+        if not self.transitions and type(self).T is MDP.T:
             print("Warning: Transition table is empty.")
 
         self.gamma = gamma
 
         self.reward = reward or {s: 0 for s in self.states}
 
+        # actions(s) is called for every state in the solvers' hot loops
+        self._actions_cache = {s: [None] if s in self.terminals else self.actlist
+                               for s in self.states or ()}
+
         # self.check_consistency()
 
     def R(self, state):
@@ -85,10 +123,7 @@ class MDP:
         fixed list of actions, except for terminal states. Override this
         method if you need to specialize by state."""
 
-        if state in self.terminals:
-            return [None]
-        else:
-            return self.actlist
+        return self._actions_cache[state]
 
     def get_states_from_transitions(self, transitions):
         if isinstance(transitions, dict):
@@ -128,9 +163,11 @@ class GridMDP(MDP):
     """A two-dimensional grid MDP, as in [Figure 17.1]. All you have to do is
     specify the grid as a list of lists of rewards; use None for an obstacle
     (unreachable state). Also, you should specify the terminal states.
-    An action is an (x, y) unit vector; e.g. (1, 0) means move east."""
+    An action is an (x, y) unit vector; e.g. (1, 0) means move east.
+    Rewards, transition probabilities and utilities are stored as dtype;
+    float32 halves the memory traffic of the solvers compared to float64."""
 
-    def __init__(self, grid, terminals, init=(0, 0), gamma=.9):
+    def __init__(self, grid, terminals, init=(0, 0), gamma=.9, dtype=np.float32):
         grid.reverse()     # because we want row 0 on bottom, not on top
         reward = {}
         states = set()
@@ -143,32 +180,95 @@ class GridMDP(MDP):
                     states.add((x, y))
                     reward[(x, y)] = grid[y][x]
         self.states = states
+        # number the states so that utilities and policies can live in arrays;
+        # ids[y, x] is the index of state (x, y), or -1 for an obstacle
+        valid = np.array([[bool(v) for v in row] for row in grid])
+        n = len(states)
+        ids = np.full((self.rows, self.cols), -1, dtype=np.int32)
+        ids.T[valid.T] = np.arange(n)
+        xs, ys = np.nonzero(valid.T)
+        self.state_list = list(zip(xs.tolist(), ys.tolist()))
+        self.state_index = {s: i for i, s in enumerate(self.state_list)}
+        self.reward_vector = np.array([reward[s] for s in self.state_list], dtype=dtype)
         actlist = orientations
-        transitions = {}
-        for s in states:
-            transitions[s] = {}
-            for a in actlist:
-                transitions[s][a] = self.calculate_T(s, a)
-        MDP.__init__(self, init, actlist=actlist,
-                     terminals=terminals, transitions=transitions, 
+        self.action_index = {a: i for i, a in enumerate(actlist)}
+        # next_state[a, i] is the index of the state reached by moving in
+        # direction actlist[a] from state i; obstacles and edges bounce back
+        padded = np.pad(ids, 1, constant_values=-1)
+        self.next_state = np.empty((len(actlist), n), dtype=np.int32)
+        for a, (dx, dy) in enumerate(actlist):
+            target = padded[1+dy:1+dy+self.rows, 1+dx:1+dx+self.cols]
+            self.next_state[a] = np.where(target >= 0, target, ids).T[valid.T]
+        # every action goes straight with probability 0.8 and turns right or
+        # left with 0.1 each; next_s[a, i] holds those three result states
+        self.probs = np.array([0.8, 0.1, 0.1])
+        self._probs_list = self.probs.tolist()
+        index = self.action_index
+        outcome_dirs = [[index[a], index[turn_right(a)], index[turn_left(a)]]
+                        for a in actlist]
+        self.next_s = np.ascontiguousarray(self.next_state[outcome_dirs].transpose(0, 2, 1))
+        MDP.__init__(self, init, actlist=actlist, terminals=terminals,
                      reward=reward, states=states, gamma=gamma)
+        self.P = self.transition_matrix()
 
     def calculate_T(self, state, action):
         if action:
-            return [(0.8, self.go(state, action)),
-                    (0.1, self.go(state, turn_right(action))),
-                    (0.1, self.go(state, turn_left(action)))]
+            outcomes = self.next_s[self.action_index[action], self.state_index[state]]
+            return [(p, self.state_list[i])
+                    for (p, i) in zip(self._probs_list, outcomes.tolist())]
         else:
             return [(0.0, state)]
     
     def T(self, state, action):
-        return self.transitions[state][action] if action else [(0.0, state)]
+        return self.calculate_T(state, action)
+
+    def transition_matrix(self):
+        """Return the transition matrices of all actions stacked into one
+        sparse matrix of shape (len(actlist)*n, n). Row a*n + i holds the
+        distribution over result states of doing actlist[a] in state i;
+        the rows of terminal states are empty."""
+
+        n, m = len(self.state_list), len(self.actlist)
+        cols = self.next_s
+        rows = np.broadcast_to(np.arange(m*n).reshape(m, n, 1), cols.shape)
+        data = np.broadcast_to(self.probs.astype(self.reward_vector.dtype), cols.shape)
+        keep = np.ones(n, dtype=bool)
+        # terminals on obstacles or off the grid are never reached
+        keep[[self.state_index[t] for t in self.terminals
+              if t in self.state_index]] = False
+        keep = np.broadcast_to(keep.reshape(1, n, 1), cols.shape)
+        return sp.csr_matrix((data[keep], (rows[keep], cols[keep])), shape=(m*n, n))
  
+    def check_consistency(self):
+        """GridMDP keeps no transitions table, so check its next-state and
+        probability tables instead."""
+
+        n = len(self.state_list)
+
+        # check that all result states are valid state indices
+        assert ((0 <= self.next_s) & (self.next_s < n)).all()
+
+        # check that init is a valid state
+        assert self.init in self.states
+
+        # check reward for each state
+        assert set(self.reward.keys()) == set(self.states)
+
+        # check that all terminals are valid states
+        assert all(t in self.states for t in self.terminals)
+
+        # check that probability distributions for all actions sum to 1
+        assert abs(sum(self.probs) - 1) < 0.001
+        sums = np.asarray(self.P.sum(axis=1)).reshape(len(self.actlist), n)
+        for t in self.terminals:
+            sums[:, self.state_index[t]] = 1
+        assert (abs(sums - 1) < 0.001).all()
+
     def go(self, state, direction):
         """Return the state that results from going in this direction."""
 
-        state1 = vector_add(state, direction)
-        return state1 if state1 in self.states else state
+        i = self.next_state[self.action_index[direction], self.state_index[state]]
+        return self.state_list[i]
 
     def to_grid(self, mapping):
         """Convert a mapping from (x, y) to v into a [[..., v, ...]] grid."""
@@ -182,38 +282,255 @@ class GridMDP(MDP):
         return self.to_grid({s: chars[a] for (s, a) in policy.items()})
 
 
-def policy_evaluation(pi, U, mdp, k=20):
-    """Return an updated utility mapping U from each state in the MDP to its
-    utility, using an approximation (modified policy iteration)."""
-
-    R, T, gamma = mdp.R, mdp.T, mdp.gamma
+def policy_matrix(pi, mdp):
+    """Return the transition matrix of the Markov chain obtained by following
+    pi in the MDP, as a sparse CSR matrix over the state indices. pi[i] is the
+    index of the chosen action in mdp.actions(mdp.state_list[i])."""
+
+    # row a*n + i of mdp.P is the distribution of doing action a in state i
+    n = len(pi)
+    return mdp.P[pi*n + np.arange(n)]
+
+SINGULAR_EVALUATION = ("Policy has no finite utilities: with gamma = 1, some state "
+                       "never reaches a terminal state under it; use gamma < 1")
+APPROXIMATE_DISCOUNT = ("Approximate evaluation (k given) needs gamma < 1 to "
+                        "bound the utility error when stopping")
+
+@njit(fastmath=True, cache=True)
+def bellman_sweep(indptr, indices, data, r, U, gamma):
+    """Apply the Bellman backup U = r + gamma*P_pi U in place, where P_pi is
+    given by the indptr, indices and data arrays of its CSR form. States later
+    in the sweep already see the updated utilities of earlier ones
+    (Gauss-Seidel), so fewer sweeps are needed than with a separate output."""
+    for s in range(len(r)):
+        acc = 0.0
+        for k in range(indptr[s], indptr[s+1]):
+            acc += data[k]*U[indices[k]]
+        U[s] = r[s] + gamma*acc
+
+@njit(fastmath=True, parallel=True, cache=True)
+def parallel_bellman_sweep(indptr, indices, data, r, U, gamma, out):
+    """Write the Bellman backup r + gamma*P_pi U into out, with the states
+    split across threads. Unlike bellman_sweep this reads only the old U,
+    so that no thread reads a utility while another one writes it."""
+    for s in prange(len(r)):
+        acc = 0.0
+        for k in range(indptr[s], indptr[s+1]):
+            acc += data[k]*U[indices[k]]
+        out[s] = r[s] + gamma*acc
+
+def policy_evaluation(pi, mdp, U=None, k=None, parallel=False):
+    """Return the utility vector U over the state indices of the MDP under
+    policy pi. By default this solves the linear system (I - gamma*P_pi) U = r
+    exactly; if k is given, it instead applies k Bellman sweeps starting from
+    U, an approximation (modified policy iteration)."""
+
+    P_pi, r, gamma = policy_matrix(pi, mdp), mdp.reward_vector, mdp.gamma
+    if k is None:
+        A = sp.identity(len(r), dtype=r.dtype, format='csr') - gamma*P_pi
+        with warnings.catch_warnings():
+            # a singular system is reported below instead
+            warnings.simplefilter('ignore', MatrixRankWarning)
+            U = spsolve(A.tocsc(), r)
+        if not np.isfinite(U).all():
+            raise ValueError(SINGULAR_EVALUATION)
+        return U
+    U = np.zeros_like(r) if U is None else U.copy()
+    if parallel:
+        out = np.empty_like(U)
+        for i in range(k):
+            parallel_bellman_sweep(P_pi.indptr, P_pi.indices, P_pi.data, r, U, gamma, out)
+            U, out = out, U
+        return U
     for i in range(k):
-        for s in mdp.states:
-            U[s] = R(s) + gamma*sum(p*U[s1] for (p, s1) in T(s, pi[s]))
+        bellman_sweep(P_pi.indptr, P_pi.indices, P_pi.data, r, U, gamma)
     return U
 
 def expected_utility(a, s, U, mdp):
     """The expected utility of doing a in state s, according to the MDP and U."""
-    return sum(p*U[s1] for (p, s1) in mdp.T(s, a))
-
-def policy_iteration(mdp):
-    """Solve an MDP by policy iteration [Figure 17.7]"""
-
-    U = {s: 0 for s in mdp.states}
-    pi = {s: random.choice(mdp.actions(s)) for s in mdp.states}
+    return sum(p*U[mdp.state_index[s1]] for (p, s1) in mdp.T(s, a))
+
+@njit(fastmath=True, parallel=True, cache=True)
+def parallel_greedy_policy(indptr, indices, data, n_actions, U, pi, tol, pi_new, eu):
+    """Write into pi_new the greedy action of every state with respect to U,
+    and its expected utility into eu, with the states split across threads.
+    The stacked transition matrix P of the MDP is given by its CSR arrays."""
+    n = len(U)
+    for s in prange(n):
+        # keep only the running best in scalars, so that the threads do not
+        # allocate an array of utilities per state
+        row = pi[s]*n + s
+        current = 0.0
+        for k in range(indptr[row], indptr[row+1]):
+            current += data[k]*U[indices[k]]
+        best, best_eu = 0, -np.inf
+        for a in range(n_actions):
+            row = a*n + s
+            acc = 0.0
+            for k in range(indptr[row], indptr[row+1]):
+                acc += data[k]*U[indices[k]]
+            if acc > best_eu:
+                best, best_eu = a, acc
+        if best_eu > current + tol:
+            pi_new[s] = best
+            eu[s] = best_eu
+        else:
+            pi_new[s] = pi[s]
+            eu[s] = current
+
+def improvement_tolerance(dtype):
+    """The smallest gain in expected utility that policy improvement acts on,
+    just above the rounding noise of utilities computed in dtype."""
+    return 1e-6 if np.dtype(dtype) == np.float32 else 1e-10
+
+def policy_improvement(pi, U, mdp, parallel=False, tol=None, out=None):
+    """Return the policy that is greedy with respect to U, along with the
+    expected utility of its action in every state. A state only switches away
+    from its action in pi on an improvement of more than tol, so that tied
+    actions (whose utilities differ by rounding noise) cannot flip forever.
+    The policy is written into out if given, which must not be pi."""
+
+    P, n = mdp.P, len(U)
+    if tol is None:
+        tol = improvement_tolerance(U.dtype)
+    pi_new = np.empty_like(pi) if out is None else out
+    if parallel:
+        eu = np.empty_like(U)
+        parallel_greedy_policy(P.indptr, P.indices, P.data, len(mdp.actlist),
+                               U, pi, tol, pi_new, eu)
+        return pi_new, eu
+    # expected utility of every action in every state, shape (|A|, |S|);
+    # terminal states only have the None action, at index 0
+    states = np.arange(n)
+    EU = P.dot(U).reshape(len(mdp.actlist), n)
+    best = EU.argmax(axis=0).astype(pi.dtype)
+    improved = EU[best, states] > EU[pi, states] + tol
+    np.copyto(pi_new, pi)
+    np.copyto(pi_new, best, where=improved)
+    return pi_new, EU[pi_new, states]
+
+def initial_policy(mdp):
+    """Return a starting policy for policy iteration that moves every state
+    along a shortest path towards the terminal states with positive reward,
+    found by a breadth-first search back from them. This is much closer to
+    optimal than a random policy, so fewer improvement steps are needed."""
+
+    index = mdp.state_index
+    pi = np.zeros(len(index), dtype=np.int32)
+    frontier = deque(t for t in mdp.terminals if t in index and mdp.R(t) > 0)
+    seen = set(mdp.terminals)
+    while frontier:
+        s1 = frontier.popleft()
+        for a, (dx, dy) in enumerate(mdp.actlist):
+            # doing action a in s leads to s1
+            s = (s1[0] - dx, s1[1] - dy)
+            if s in index and s not in seen:
+                seen.add(s)
+                pi[index[s]] = a
+                frontier.append(s)
+    return pi
+
+def policy_iteration(mdp, k=None, parallel=False, gpu=GPU_AVAILABLE,
+                     epsilon=1e-3):
+    """Solve an MDP by policy iteration [Figure 17.7]. If k is given, each
+    policy is only evaluated approximately, with k Bellman sweeps, and the
+    loop stops once the policy is unchanged and a Bellman backup moves no
+    utility by more than epsilon*(1 - gamma)/(2*gamma). With parallel set,
+    the sweeps and improvement steps run multithreaded; with gpu set (the
+    default when a CUDA device is found), on the GPU instead.
+    Returns the policy along with an array of the expected utility of the
+    chosen action in every state, for every improvement step."""
+
+    if k is not None and mdp.gamma >= 1:
+        raise ValueError(APPROXIMATE_DISCOUNT)
+    if gpu:
+        return gpu_policy_iteration(mdp, k, epsilon=epsilon)
+    state_list, actions = mdp.state_list, mdp.actions
+    if k is not None:
+        threshold = epsilon*(1 - mdp.gamma)/(2*mdp.gamma)
+    U = np.zeros_like(mdp.reward_vector)
+    pi = initial_policy(mdp)
+    pi_new = np.empty_like(pi)
+    # with approximate evaluation, policy iteration can cycle between policies
+    seen = {}
     reward_list = []
     while True:
-        U = policy_evaluation(pi, U, mdp)
-        unchanged = True
-        for s in mdp.states:
-            a = argmax(mdp.actions(s), key=lambda a: expected_utility(a, s, U, mdp))
-            reward_list.append(expected_utility(a, s, U, mdp))
-            if a != pi[s]:
-                pi[s] = a
-                unchanged = False
+        U = policy_evaluation(pi, mdp, U, k, parallel)
+        _, eu = policy_improvement(pi, U, mdp, parallel, out=pi_new)
+        reward_list.append(eu)
+        unchanged = np.array_equal(pi, pi_new)
+        pi, pi_new = pi_new, pi
+        if k is not None:
+            # the improvement step is itself one Bellman optimality backup,
+            # so the next evaluation can start from its result; a policy
+            # that stopped changing is only final once that backup barely
+            # moves U, since a few sweeps can leave U far from converged
+            U_next = mdp.reward_vector + mdp.gamma*eu
+            residual = np.abs(U_next - U).max()
+            U = U_next
+            if unchanged:
+                unchanged = residual < threshold
+            else:
+                # revisiting a policy is only a cycle if U has stopped
+                # converging since; otherwise the sweeps are still catching up
+                key = pi.tobytes()
+                unchanged = seen.get(key, np.inf) <= residual
+                seen[key] = residual
         if unchanged:
-            return pi, reward_list
+            return ({s: actions(s)[pi[i]] for i, s in enumerate(state_list)},
+                    np.concatenate(reward_list))
         
+def gpu_policy_iteration(mdp, k=None, tol=None, epsilon=1e-3):
+    """Same as policy_iteration, with the transition matrix, utilities and
+    policy resident on the GPU; only the final policy is copied back."""
+
+    state_list, actions, gamma = mdp.state_list, mdp.actions, mdp.gamma
+    n = len(state_list)
+    P = cpsp.csr_matrix(mdp.P)
+    r = cp.asarray(mdp.reward_vector)
+    I = cpsp.identity(n, dtype=r.dtype, format='csr')
+    states = cp.arange(n)
+    U = cp.zeros_like(r)
+    if tol is None:
+        tol = improvement_tolerance(r.dtype)
+    if k is not None:
+        threshold = epsilon*(1 - gamma)/(2*gamma)
+    pi = cp.asarray(initial_policy(mdp))
+    seen = {}
+    reward_list = []
+    while True:
+        # row a*n + i of P is the distribution of doing action a in state i
+        P_pi = P[pi*n + states]
+        if k is None:
+            U = gpu_spsolve(I - gamma*P_pi, r)
+            if not bool(cp.isfinite(U).all()):
+                raise ValueError(SINGULAR_EVALUATION)
+        else:
+            for i in range(k):
+                U = r + gamma*P_pi.dot(U)
+        EU = P.dot(U).reshape(len(mdp.actlist), n)
+        best = cp.argmax(EU, axis=0).astype(cp.int32)
+        improved = EU[best, states] > EU[pi, states] + tol
+        pi_new = cp.where(improved, best, pi)
+        reward_list.append(EU[pi_new, states])
+        unchanged = bool(cp.array_equal(pi_new, pi))
+        pi = pi_new
+        if k is not None:
+            U_next = r + gamma*reward_list[-1]
+            residual = float(cp.abs(U_next - U).max())
+            U = U_next
+            if unchanged:
+                unchanged = residual < threshold
+            else:
+                # the host copy is only needed to detect cycles
+                key = cp.asnumpy(pi).tobytes()
+                unchanged = seen.get(key, np.inf) <= residual
+                seen[key] = residual
+        if unchanged:
+            pi = cp.asnumpy(pi)
+            reward_list = cp.asnumpy(cp.concatenate(reward_list))
+            return {s: actions(s)[pi[i]] for i, s in enumerate(state_list)}, reward_list
+
 def print_table(table, header=None, sep='   ', numfmt='{}'):
     """Print a list of lists as a table, so that columns line up nicely.
     header, if specified, will be printed as the first row.
@@ -246,7 +563,7 @@ def printPolicyAndExecutionTime(x, env):
     pi, reward_list = policy_iteration(env)
     execution_time = time.time() - start_time
     #print_table(env.to_arrows(pi))
-    avg_reward = sum(reward_list) / len(reward_list)
+    avg_reward = reward_list.mean()
     print("Execution time for %d iteration: %0.2f seconds and Average reward per iteration is %0.2f"% (x, execution_time, avg_reward))
     return execution_time, avg_reward
         
@@ -269,12 +586,19 @@ sequential_decision_environment_5_5 = GridMDP([[-0.04, -0.04, -0.04, -0.04, -0.0
                                            [None, -0.04, -0.04, -0.04, -0.04]],
                                           terminals=[(4, 2), (4, 3)])'''
 
-def getMdpEnv(x_dim, y_dim, pos_terminal, neg_terminal):
+# a few environments are enough to reuse one across repeated solves; the
+# time test builds each size only once, and keeping every size up to 500x500
+# alive would hold over a gigabyte of transition matrices
+@functools.lru_cache(maxsize=4)
+def getMdpEnv(x_dim, y_dim, pos_terminal, neg_terminal, seed=0):
+    # the obstacles come from a generator seeded with seed rather than the
+    # global one, so that a cached environment is the same as a fresh one
+    rng = random.Random(seed)
     myEnv = []
     for x in range (x_dim):
         myEnv_y = []
         for y in range (y_dim):
-            y_block = random.uniform(0, 1)
+            y_block = rng.uniform(0, 1)
             if y_block > 0.9:
                 myEnv_y.append(None)
             else:
@@ -284,39 +608,47 @@ def getMdpEnv(x_dim, y_dim, pos_terminal, neg_terminal):
     myEnv[neg_terminal[1]][neg_terminal[0]] = -1
     return GridMDP(myEnv[::-1], terminals=[pos_terminal, neg_terminal])
     
-getMdpEnv(5, 5, (4,2), (4,3))
-            
 
-printPolicyAndExecutionTime(2, getMdpEnv(2, 2, (1,0), (1,1)))
-printPolicyAndExecutionTime(3, getMdpEnv(3, 4, (3,2), (3,1)))
-printPolicyAndExecutionTime(5, getMdpEnv(5, 5, (4,2), (4,3)))
-
-print('Collecting data for time tests')
-print('-'*75)
-
-execution_time_list = []
-iteration_num = []
-avg_reward_list = []
-for x in range(2, 500, 20):
-    iteration_num.append(x)
-    execution_time, avg_reward = printPolicyAndExecutionTime(x, getMdpEnv(x, x, (x-1,x-1), (x-1,x-2)))
-    execution_time_list.append(execution_time)
-    avg_reward_list.append(avg_reward)
-
-
-import matplotlib.pyplot as plt
-plt.plot(iteration_num, execution_time_list)
-plt.axis([0, iteration_num[-1], 0, execution_time_list[-1]+1])
-plt.xlabel('size of the environment')
-plt.ylabel('execution time')
-plt.title('MDP execution time vs environment size')
-plt.savefig('MDP execution time.png')
-plt.show()
-
-plt.plot(iteration_num, avg_reward_list)
-plt.axis([0, iteration_num[-1], min(avg_reward_list), max(avg_reward_list)])
-plt.xlabel('size of the environment')
-plt.ylabel('average reward')
-plt.title('MDP average reward vs environment size')
-plt.savefig('MDP average reward.png')
-plt.show()
\ No newline at end of file
+def runTimeTest(x):
+    return printPolicyAndExecutionTime(x, getMdpEnv(x, x, (x-1,x-1), (x-1,x-2)))
+
+if __name__ == '__main__':
+    printPolicyAndExecutionTime(2, getMdpEnv(2, 2, (1,0), (1,1)))
+    printPolicyAndExecutionTime(3, getMdpEnv(3, 4, (3,2), (3,1)))
+    printPolicyAndExecutionTime(5, getMdpEnv(5, 5, (4,2), (4,3)))
+
+    print('Collecting data for time tests')
+    print('-'*75)
+
+    # the sizes are independent, so run them on all cores; a single GPU is
+    # better used by one process at a time. Note that each size is then timed
+    # while the others compete for cores and memory bandwidth, so the times
+    # are higher than for a size solved on its own
+    iteration_num = list(range(2, 500, 20))
+    if GPU_AVAILABLE:
+        results = list(map(runTimeTest, iteration_num))
+        timing = ''
+    else:
+        with multiprocessing.Pool() as pool:
+            results = pool.map(runTimeTest, iteration_num)
+        timing = ' (sizes run concurrently)'
+    execution_time_list = [execution_time for execution_time, _ in results]
+    avg_reward_list = [avg_reward for _, avg_reward in results]
+
+
+    import matplotlib.pyplot as plt
+    plt.plot(iteration_num, execution_time_list)
+    plt.axis([0, iteration_num[-1], 0, execution_time_list[-1]+1])
+    plt.xlabel('size of the environment')
+    plt.ylabel('execution time')
+    plt.title('MDP execution time vs environment size' + timing)
+    plt.savefig('MDP execution time.png')
+    plt.show()
+
+    plt.plot(iteration_num, avg_reward_list)
+    plt.axis([0, iteration_num[-1], min(avg_reward_list), max(avg_reward_list)])
+    plt.xlabel('size of the environment')
+    plt.ylabel('average reward')
+    plt.title('MDP average reward vs environment size')
+    plt.savefig('MDP average reward.png')
+    plt.show()
\ No newline at end of file